@@ -1,7 +1,30 @@
-import colorama
+import os
+import sys
 
-# Initialize Colorama for cross-platform ANSI support
-colorama.init()
+# Colors are emitted on an interactive terminal, or anywhere when FORCE_COLOR is set to
+# anything but "0"; FORCE_COLOR=0 and NO_COLOR turn them off in either case
+_FORCE_COLOR = os.environ.get("FORCE_COLOR", "")
+USE_COLOR = (
+    not os.environ.get("NO_COLOR")
+    and _FORCE_COLOR != "0"
+    and (_FORCE_COLOR != "" or sys.stdout.isatty())
+)
+
+_colors_initialized = False
+
+
+def init_colors():
+    """
+    Initializes Colorama so ANSI codes work in the Windows console.
+    colorama is only imported here, on the first call, and only when colors are in use.
+    Other platforms' terminals understand ANSI codes directly, so colorama is not needed there.
+    """
+    global _colors_initialized
+    if USE_COLOR and os.name == "nt" and not _colors_initialized:
+        import colorama
+
+        colorama.init()
+        _colors_initialized = True
 
 
 # ANSI color codes
@@ -14,3 +37,21 @@ class Colors:
     CYAN = "\033[96m"
     BOLD = "\033[1m"
     UNDERLINE = "\033[4m"
+
+
+if not USE_COLOR:
+    # Blank the codes so messages are plain text in logs and pipes
+    for _name in [name for name in vars(Colors) if name.isupper()]:
+        setattr(Colors, _name, "")
+
+# Module-level aliases, bound after the blanking above, for `from cli_colors import RED, RESET`
+RESET, RED, GREEN, YELLOW, BLUE, CYAN, BOLD, UNDERLINE = (
+    Colors.RESET,
+    Colors.RED,
+    Colors.GREEN,
+    Colors.YELLOW,
+    Colors.BLUE,
+    Colors.CYAN,
+    Colors.BOLD,
+    Colors.UNDERLINE,
+)
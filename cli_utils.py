@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+from cli_colors import RESET, RED, YELLOW, CYAN
+
+# Returned by parse_choice when the user asks to quit
+QUIT = "q"
+
+# Fixed parts of the numbered menus, formatted once at import
+_QUIT_OPTION = f"  {YELLOW}[q]{RESET} Quit"
+_PROMPT_SELECT = f"{CYAN}Enter a number or 'q' to quit: {RESET}"
+_ERR_INVALID_NUM = f"{RED}Invalid number. Please choose a number from the list.{RESET}"
+_ERR_INVALID_INPUT = f"{RED}Invalid input. Please enter a number or 'q'.{RESET}"
+
+
+def parse_choice(choice, count):
+    """
+    Parses the answer to a numbered menu with count entries.
+    Returns QUIT for 'q' (in any case), the 0-based index for a number from 1 to count,
+    or None for anything else. The string is converted with a single int() call.
+    """
+    choice = choice.strip()
+    if choice.lower() == QUIT:
+        return QUIT
+    try:
+        index = int(choice) - 1
+    except ValueError:
+        return None
+    return index if 0 <= index < count else None
+
+
+def select_from(items, header, formatter=str):
+    """
+    Shows items as a numbered menu under header and prompts until the user picks one.
+    formatter turns an item into its menu label. The menu is rendered once and
+    written in a single call; invalid answers only print an error and prompt again.
+    Returns the selected item, or None if the user quits.
+    """
+    lines = [header]
+    for i, item in enumerate(items, 1):
+        lines.append(f"  {YELLOW}[{i}]{RESET} {formatter(item)}")
+    lines.append(_QUIT_OPTION)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+    while True:
+        choice = input(_PROMPT_SELECT).strip()
+        index = parse_choice(choice, len(items))
+        if index == QUIT:
+            return None
+        elif index is not None:
+            return items[index]
+        elif choice.isdigit():
+            print(_ERR_INVALID_NUM)
+        else:
+            print(_ERR_INVALID_INPUT)
+
+
+def write_atomic(path, data, mode=0o644):
+    """
+    Writes the bytes data to path through a uniquely named temporary file in the same
+    directory, which is then renamed over path. Readers and concurrent runs never see a
+    partial file, and an interrupted write leaves path as it was.
+    Raises OSError if the file cannot be written.
+    """
+    # mkstemp opens in binary mode, so Windows does not turn the newlines into CRLF
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".",
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
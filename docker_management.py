@@ -1,81 +1,333 @@
+import collections
+import json
 import os
+import shlex
+import shutil
 import subprocess
-from cli_colors import Colors
+import sys
+from cli_colors import RESET, RED, GREEN, YELLOW, BLUE, CYAN
 
+# Resolved once so every docker call skips the PATH lookup; None if docker is not installed
+_DOCKER = shutil.which("docker")
+_DOCKER_NOT_FOUND = f"{RED}Error: 'docker' command not found. Please ensure Docker is installed and in your system's PATH.{RESET}"
 
-def generate_dockerfile_from_yaml_info(project_info):
+# Entries kept out of the Docker build context sent to the daemon
+DOCKERIGNORE_ENTRIES = ["node_modules/", ".git/", "dist/"]
+
+# Terminates the heredoc holding the build steps; lengthened if a step contains it
+_STEPS_DELIMITER = "REPRO_BUILD_STEPS"
+
+# Number of trailing build output lines shown when a build fails
+BUILD_LOG_TAIL_LINES = 200
+
+# Package manager -> (lockfile, install command), checked in this order
+PACKAGE_MANAGERS = {
+    "pnpm": ("pnpm-lock.yaml", "pnpm install --frozen-lockfile"),
+    "yarn": ("yarn.lock", "yarn install --frozen-lockfile"),
+    "npm": ("package-lock.json", "npm ci --prefer-offline --no-audit"),
+}
+
+# Commands a package manager needs before its first use in the image
+_SETUP_COMMANDS = {"pnpm": "corepack enable"}
+
+# Subcommands that install from the lockfile; a bare 'yarn' (or 'yarn --flags') also installs
+_INSTALL_SUBCOMMANDS = {
+    "npm": frozenset({"ci", "install", "i"}),
+    "yarn": frozenset({"install"}),
+    "pnpm": frozenset({"install", "i"}),
+}
+
+# Shell syntax that makes a step more than a single plain command
+_SHELL_OPERATORS = ("&", "|", ";", "<", ">", "`", "$(")
+
+# Install configuration copied into the dependency layer when present in the project:
+# registry and resolution settings, yarn 2+ releases and plugins, and patched dependencies
+_INSTALL_CONFIG_FILES = [".npmrc", ".yarnrc", ".yarnrc.yml", ".pnpmfile.cjs"]
+_INSTALL_CONFIG_DIRS = [".yarn/releases", ".yarn/plugins", ".yarn/patches", "patches"]
+
+# Runs the install scripts of the dependencies and the project itself without touching
+# node_modules; 'npm rebuild' covers preinstall/install/postinstall but not prepare
+_NPM_RUN_INSTALL_SCRIPTS = "npm rebuild && npm run --if-present prepare"
+
+
+def detect_package_manager(project_path):
     """
-    Generates the content for a Dockerfile based on information extracted from YAML.
+    Detects the package manager of a Node.js project from its lockfile.
+    Returns 'pnpm', 'yarn' or 'npm', or None if there is no package.json or lockfile.
     """
-    node_version = project_info.get("node_version", "lts")
-    build_steps = project_info.get("build_steps_from_yaml", [])
-    project_name = os.path.basename(project_info["project_path"])
+    if not os.path.isfile(os.path.join(project_path, "package.json")):
+        return None
+    for package_manager, (lockfile, _) in PACKAGE_MANAGERS.items():
+        if os.path.isfile(os.path.join(project_path, lockfile)):
+            return package_manager
+    return None
+
+
+def _is_install_step(step, package_manager):
+    """
+    Returns True if step is a single plain install command of package_manager,
+    such as 'npm ci --legacy-peer-deps' or 'yarn install --frozen-lockfile'.
+    Commands that name packages ('npm install lodash') or install globally
+    ('npm i -g pnpm') do not install the project's dependencies and return False.
+    """
+    if "\n" in step or any(op in step for op in _SHELL_OPERATORS):
+        return False
+    words = step.split()
+    if not words or words[0] != package_manager:
+        return False
+    if len(words) == 1 or words[1].startswith("-"):
+        if package_manager != "yarn":
+            return False
+        options = words[1:]
+    elif words[1] in _INSTALL_SUBCOMMANDS[package_manager]:
+        options = words[2:]
+    else:
+        return False
+    return all(
+        word.startswith("-") and word not in ("-g", "--global", "--location=global")
+        for word in options
+    )
 
-    dockerfile_content = f"""
-# Use a specific Node.js version for reproducibility, derived from YAML
-FROM node:{node_version}-alpine
 
-# Set the working directory in the container
-WORKDIR /app/{project_name}
+def _uses_workspaces(project_path):
+    """
+    Returns True if the project is a workspace monorepo (pnpm-workspace.yaml, or a
+    'workspaces' entry in package.json), or if its package.json cannot be read.
+    """
+    if os.path.isfile(os.path.join(project_path, "pnpm-workspace.yaml")):
+        return True
+    try:
+        with open(os.path.join(project_path, "package.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return not isinstance(manifest, dict) or "workspaces" in manifest
 
-# Copy all project files into the container
-COPY . .
 
-# Install dependencies and run build steps as defined in YAML
-# These steps are extracted from the selected YAML file.
-"""
-    if build_steps:
-        dockerfile_content += "\n# Build steps from YAML:\n"
-        for i, step in enumerate(build_steps):
-            cleaned_step = step.replace("\n", " \\\n    ")
-            dockerfile_content += f"RUN {cleaned_step}\n"
-    else:
-        dockerfile_content += (
-            "# No specific build steps found in the selected YAML file.\n"
+def generate_dockerfile_from_yaml_info(project_info):
+    """
+    Generates the content for a Dockerfile based on information extracted from YAML.
+    project_info is the ProjectInfo of the project.
+    """
+    node_version = project_info.node_version or "lts"
+    build_steps = project_info.build_steps_from_yaml
+    project_name = project_info.project_name or os.path.basename(
+        project_info.project_path
+    )
+    package_manager = project_info.package_manager or detect_package_manager(
+        project_info.project_path
+    )
+
+    # The Dockerfile is assembled as a list of lines and joined once at the end
+    lines = [
+        "# Use a specific Node.js version for reproducibility, derived from YAML",
+        f"FROM node:{node_version}-alpine",
+        "",
+        "# Set the working directory in the container",
+        f"WORKDIR /app/{project_name}",
+        "",
+    ]
+    build_steps = [step.strip() for step in build_steps if step and step.strip()]
+    post_copy_install = None
+    # Workspace monorepos need every member's manifest to install, so they keep the single COPY
+    if package_manager in PACKAGE_MANAGERS and not _uses_workspaces(
+        project_info.project_path
+    ):
+        # Dependencies get their own layer, so it stays cached until the manifest, lockfile or
+        # install configuration changes. The job's own install command is reused so its flags
+        # apply; install scripts (postinstall, prepare, ...) are skipped here because the
+        # sources are not copied yet.
+        lockfile, install_command = PACKAGE_MANAGERS[package_manager]
+        job_install = next(
+            (step for step in build_steps if _is_install_step(step, package_manager)),
+            None,
         )
-        dockerfile_content += (
-            "# You may need to add manual installation/build commands here.\n"
+        config_files = [
+            name
+            for name in _INSTALL_CONFIG_FILES
+            if os.path.isfile(os.path.join(project_info.project_path, name))
+        ]
+        config_dirs = [
+            name
+            for name in _INSTALL_CONFIG_DIRS
+            if os.path.isdir(os.path.join(project_info.project_path, name))
+        ]
+        # Yarn 2+ (configured by .yarnrc.yml) has no --ignore-scripts and skips builds with --mode
+        skip_scripts = (
+            "--mode=skip-build" if ".yarnrc.yml" in config_files else "--ignore-scripts"
         )
+        layer_command = f"{job_install or install_command} {skip_scripts}"
+        if package_manager in _SETUP_COMMANDS:
+            layer_command = f"{_SETUP_COMMANDS[package_manager]} && {layer_command}"
+        lines += [
+            f"# Fetch dependencies from the {package_manager} lockfile; install scripts run after COPY",
+            f"COPY {' '.join(['package.json', lockfile] + config_files)} ./",
+        ]
+        lines += [f"COPY {name} ./{name}/" for name in config_dirs]
+        lines += [
+            f"RUN {layer_command}",
+            "",
+            "# Git hooks are not used in the image, and .git is kept out of the build context",
+            "ENV HUSKY=0",
+            "",
+        ]
+        if package_manager == "npm":
+            # 'npm ci' deletes node_modules before installing, so the job's install step is
+            # dropped and only the skipped install scripts run once the sources are present
+            if job_install is not None:
+                build_steps.remove(job_install)
+            post_copy_install = _NPM_RUN_INSTALL_SCRIPTS
+        elif job_install is None:
+            # yarn and pnpm keep node_modules, so the job's install step runs again below and
+            # only finishes the install; without one, the default install command does that
+            post_copy_install = install_command
+
+    lines += [
+        "# Copy all project files into the container",
+        "COPY . .",
+        "",
+    ]
+    if post_copy_install:
+        lines += [
+            "# Run the install scripts skipped above, now that the sources are present",
+            f"RUN {post_copy_install}",
+            "",
+        ]
+    lines += [
+        "# Run the steps of the selected YAML job",
+        "# These steps are extracted from the selected YAML file.",
+    ]
+    if build_steps:
+        # All steps share a single RUN so Docker commits one layer instead of one per step.
+        # The heredoc passes each step's script through unchanged (line breaks, comments), and
+        # every step runs in its own subshell, so 'cd' and 'export' stay local to it as they
+        # did with separate RUNs; 'set -e' stops at the first failing step.
+        delimiter = _STEPS_DELIMITER
+        while any(delimiter in step for step in build_steps):
+            delimiter += "_"
+        lines += ["", "# Build steps from YAML:"]
+        lines += [
+            f"#   {i}. {step.splitlines()[0]}" for i, step in enumerate(build_steps, 1)
+        ]
+        lines += [f"RUN <<'{delimiter}'", "set -e"]
+        for step in build_steps:
+            lines += ["(", step, ")"]
+        lines.append(delimiter)
+    else:
+        lines += [
+            "# No specific build steps found in the selected YAML file.",
+            "# You may need to add manual installation/build commands here.",
+        ]
 
-    return dockerfile_content.strip()
+    return "\n".join(lines)
 
 
-def build_docker_image(project_path, image_name, dockerfile_path_in_script_dir):
+def build_docker_image(
+    project_path,
+    image_name,
+    dockerfile_path_in_script_dir,
+    dockerfile_content=None,
+):
     """
     Builds a Docker image from the Dockerfile in the script's directory, using project_path as context.
+    If dockerfile_content is given, it is piped to docker on stdin instead of being read back from disk.
+    Build output is streamed line by line to the console.
     """
+    if not _DOCKER:
+        print(_DOCKER_NOT_FOUND)
+        return False
+
     print(
-        f"\n{Colors.BLUE}Attempting to build Docker image '{image_name}' from '{project_path}'...{Colors.RESET}"
+        f"\n{BLUE}Attempting to build Docker image '{image_name}' from '{project_path}'...{RESET}"
     )
+    # BuildKit reuses layers from the previous image (inline cache) on repeat builds
+    env = {**os.environ, "DOCKER_BUILDKIT": "1"}
     try:
         command = [
-            "docker",
+            _DOCKER,
             "build",
+            "--build-arg",
+            "BUILDKIT_INLINE_CACHE=1",
+            "--cache-from",
+            image_name,
             "-t",
             image_name,
             "-f",
-            dockerfile_path_in_script_dir,
+            "-" if dockerfile_content is not None else dockerfile_path_in_script_dir,
             project_path,
         ]
-        print(f"{Colors.CYAN}Executing: {' '.join(command)}{Colors.RESET}")
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        print(
-            f"{Colors.GREEN}Docker image '{image_name}' built successfully!{Colors.RESET}"
-        )
+        print(f"{CYAN}Executing: {' '.join(command)}{RESET}")
+        # Only the tail of the output is kept in memory, for the failure message
+        last_lines = collections.deque(maxlen=BUILD_LOG_TAIL_LINES)
+        with subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if dockerfile_content is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # The Dockerfile goes in as UTF-8 whatever the locale codec; undecodable output is replaced
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            env=env,
+        ) as process:
+            if dockerfile_content is not None:
+                process.stdin.write(dockerfile_content)
+                process.stdin.close()
+            for line in process.stdout:
+                last_lines.append(line)
+                sys.stdout.write(line)
+
+        if process.returncode != 0:
+            print(f"{RED}Error during Docker image build:{RESET}")
+            print(f"{RED}Command: {' '.join(command)}{RESET}")
+            print(f"{RED}Last output lines:\n{''.join(last_lines)}{RESET}")
+            return False
+        print(f"{GREEN}Docker image '{image_name}' built successfully!{RESET}")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"{Colors.RED}Error during Docker image build:{Colors.RESET}")
-        print(f"{Colors.RED}Command: {' '.join(e.cmd)}{Colors.RESET}")
-        print(f"{Colors.RED}Stderr:\n{e.stderr}{Colors.RESET}")
+    except KeyboardInterrupt:
+        print(f"{YELLOW}Docker image build cancelled.{RESET}")
         return False
-    except FileNotFoundError:
+    except Exception as e:
+        print(f"{RED}An unexpected error occurred during Docker build: {e}{RESET}")
+        return False
+
+
+def ensure_dockerignore(project_path):
+    """
+    Creates or updates the .dockerignore file in the project root so that
+    DOCKERIGNORE_ENTRIES are excluded from the build context.
+    """
+    dockerignore_path = os.path.join(project_path, ".dockerignore")
+
+    try:
+        # One open covers both cases: "a+" creates a missing file and appends to an existing one
+        with open(dockerignore_path, "a+", encoding="utf-8") as f:
+            created = f.tell() == 0
+            f.seek(0)
+            # Read line by line, so a large ignore file is never held in memory as a whole
+            existing = {line.strip() for line in f}
+            missing = [e for e in DOCKERIGNORE_ENTRIES if e not in existing]
+            if missing:
+                f.write(("" if created else "\n") + "\n".join(missing))
+        if created:
+            print(
+                f"{GREEN}Created '.dockerignore' file with {', '.join(DOCKERIGNORE_ENTRIES)}.{RESET}"
+            )
+        elif missing:
+            print(
+                f"{GREEN}Added {', '.join(missing)} to existing .dockerignore file.{RESET}"
+            )
+        else:
+            print(
+                f"{YELLOW}'.dockerignore' already contains {', '.join(DOCKERIGNORE_ENTRIES)}. No changes made.{RESET}"
+            )
+        return True
+    except IOError as e:
         print(
-            f"{Colors.RED}Error: 'docker' command not found. Please ensure Docker is installed and in your system's PATH.{Colors.RESET}"
+            f"{RED}Error generating/updating .dockerignore at {dockerignore_path}: {e}{RESET}"
         )
-        return False
-    except Exception as e:
         print(
-            f"{Colors.RED}An unexpected error occurred during Docker build: {e}{Colors.RESET}"
+            f"{YELLOW}Please ensure you have write permissions in the project directory.{RESET}"
         )
         return False
 
@@ -86,10 +338,14 @@ def run_docker_container(
     """
     Runs a Docker container from the specified image.
     """
+    if not _DOCKER:
+        print(_DOCKER_NOT_FOUND)
+        return False
+
     print(
-        f"\n{Colors.BLUE}Attempting to run Docker container from image '{image_name}'...{Colors.RESET}"
+        f"\n{BLUE}Attempting to run Docker container from image '{image_name}'...{RESET}"
     )
-    run_command = ["docker", "run", "--rm"]
+    run_command = [_DOCKER, "run", "--rm"]
 
     if container_name:
         run_command.extend(["--name", container_name])
@@ -100,30 +356,23 @@ def run_docker_container(
     run_command.append(image_name)
 
     if command:
-        run_command.extend(command.split())
+        run_command.extend(shlex.split(command))
 
-    print(f"{Colors.CYAN}Executing: {' '.join(run_command)}{Colors.RESET}")
+    print(f"{CYAN}Executing: {' '.join(run_command)}{RESET}")
     try:
         subprocess.run(run_command, check=True, text=True, stdout=None, stderr=None)
         print(
-            f"{Colors.GREEN}Docker container '{container_name or image_name}' started successfully!{Colors.RESET}"
+            f"{GREEN}Docker container '{container_name or image_name}' started successfully!{RESET}"
         )
         print(
-            f"{Colors.GREEN}Press Ctrl+C to stop the container (if running in foreground).{Colors.RESET}"
+            f"{GREEN}Press Ctrl+C to stop the container (if running in foreground).{RESET}"
         )
         return True
     except subprocess.CalledProcessError as e:
-        print(f"{Colors.RED}Error during Docker container run:{Colors.RESET}")
-        print(f"{Colors.RED}Command: {' '.join(e.cmd)}{Colors.RESET}")
-        print(f"{Colors.RED}Stderr:\n{e.stderr}{Colors.RESET}")
-        return False
-    except FileNotFoundError:
-        print(
-            f"{Colors.RED}Error: 'docker' command not found. Please ensure Docker is installed and in your system's PATH.{Colors.RESET}"
-        )
+        print(f"{RED}Error during Docker container run:{RESET}")
+        print(f"{RED}Command: {' '.join(e.cmd)}{RESET}")
+        print(f"{RED}Stderr:\n{e.stderr}{RESET}")
         return False
     except Exception as e:
-        print(
-            f"{Colors.RED}An unexpected error occurred during Docker run: {e}{Colors.RESET}"
-        )
+        print(f"{RED}An unexpected error occurred during Docker run: {e}{RESET}")
         return False
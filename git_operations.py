@@ -1,64 +1,312 @@
+import atexit
+import functools
+import hashlib
 import os
+import re
+import shutil
+import stat
 import subprocess
-from cli_colors import Colors
+import tempfile
+from cli_colors import RESET, RED, GREEN, YELLOW, BLUE, BOLD
+
+_SHA_RE = re.compile(r"[0-9a-f]{40}")
+
+# Resolved once so every git call skips the PATH lookup; None if git is not installed
+_GIT = shutil.which("git")
+_GIT_NOT_FOUND = f"{RED}Error: 'git' command not found. Please ensure Git is installed and in your system's PATH.{RESET}"
+
+# repo_path -> whether it has a .git directory
+_IS_GIT_CACHE = {}
+
+# Location of the shared bare clones used by checkout_worktree
+BARE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "repro-build")
+
+# (bare clone path, commit) -> worktree created this session; removed again at exit
+_WORKTREES = {}
+
+
+def is_git_repo(repo_path):
+    """
+    Returns True if repo_path has a .git directory, using a single stat call.
+    The answer is cached per path for the rest of the session.
+    """
+    is_repo = _IS_GIT_CACHE.get(repo_path)
+    if is_repo is None:
+        try:
+            is_repo = stat.S_ISDIR(os.stat(os.path.join(repo_path, ".git")).st_mode)
+        except OSError:
+            is_repo = False
+        _IS_GIT_CACHE[repo_path] = is_repo
+    return is_repo
+
+
+def _git_verify(repo_path, commit_hash):
+    """
+    Returns True if commit_hash names a commit object in the repository at repo_path.
+    """
+    result = subprocess.run(
+        [_GIT, "-C", repo_path, "cat-file", "-e", f"{commit_hash}^{{commit}}"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return result.returncode == 0
 
 
 def git_checkout(repo_path, commit_hash):
     """
     Performs a git checkout to the specified commit hash in the given repository path.
     """
-    if not os.path.isdir(os.path.join(repo_path, ".git")):
+    if not is_git_repo(repo_path):
         print(
-            f"{Colors.RED}Error: '{repo_path}' is not a Git repository. Cannot perform checkout.{Colors.RESET}"
+            f"{RED}Error: '{repo_path}' is not a Git repository. Cannot perform checkout.{RESET}"
+        )
+        return False
+    if not _GIT:
+        print(_GIT_NOT_FOUND)
+        return False
+
+    # Nothing to do if the working tree is already on the requested commit
+    target_hash = resolve_commit(repo_path, commit_hash)
+    if target_hash and target_hash == _head_sha(repo_path):
+        print(
+            f"{GREEN}Already at commit {target_hash[:7]}. Skipping Git checkout.{RESET}"
+        )
+        return True
+    # resolve_commit only skips git for a full hash; anything else was already verified by rev-parse
+    if not target_hash or (
+        _SHA_RE.fullmatch(commit_hash.lower())
+        and not _git_verify(repo_path, target_hash)
+    ):
+        print(
+            f"{RED}Error: '{commit_hash}' is not a commit in '{repo_path}'. Cannot perform checkout.{RESET}"
         )
         return False
 
     print(
-        f"{Colors.BLUE}Attempting to checkout commit:{Colors.RESET} {Colors.BOLD}{commit_hash}{Colors.RESET} {Colors.BLUE}in '{repo_path}'...{Colors.RESET}"
+        f"{BLUE}Attempting to checkout commit:{RESET} {BOLD}{commit_hash}{RESET} {BLUE}in '{repo_path}'...{RESET}"
     )
     try:
-        result = subprocess.run(
-            ["git", "checkout", commit_hash],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
+        # Only stderr is piped, and it stays as bytes until the checkout fails
+        subprocess.run(
+            [_GIT, "-C", repo_path, "checkout", "--quiet", commit_hash],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             check=True,
         )
-        print(f"{Colors.GREEN}Git checkout successful!{Colors.RESET}")
+        print(f"{GREEN}Git checkout successful!{RESET}")
         return True
     except subprocess.CalledProcessError as e:
+        print(f"{RED}Error during Git checkout to '{commit_hash}':{RESET}")
+        print(f"{RED}Command: {' '.join(e.cmd)}{RESET}")
+        print(f"{RED}Stderr:\n{e.stderr.decode(errors='replace')}{RESET}")
         print(
-            f"{Colors.RED}Error during Git checkout to '{commit_hash}':{Colors.RESET}"
-        )
-        print(f"{Colors.RED}Command: {' '.join(e.cmd)}{Colors.RESET}")
-        print(f"{Colors.RED}Stderr:\n{e.stderr}{Colors.RESET}")
-        print(
-            f"{Colors.YELLOW}Please ensure the commit hash is valid and the repository is clean (no uncommitted changes).{Colors.RESET}"
-        )
-        return False
-    except FileNotFoundError:
-        print(
-            f"{Colors.RED}Error: 'git' command not found. Please ensure Git is installed and in your system's PATH.{Colors.RESET}"
+            f"{YELLOW}Please ensure the commit hash is valid and the repository is clean (no uncommitted changes).{RESET}"
         )
         return False
     except Exception as e:
+        print(f"{RED}An unexpected error occurred during Git checkout: {e}{RESET}")
+        return False
+
+
+def _bare_cache_path(repo_path):
+    """
+    Returns the path of the cached bare clone for repo_path.
+    """
+    real_path = os.path.realpath(repo_path)
+    repo_id = hashlib.sha1(real_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(BARE_CACHE_DIR, f"{os.path.basename(real_path)}-{repo_id}.git")
+
+
+def checkout_worktree(repo_path, commit_hash):
+    """
+    Checks out commit_hash into a new detached worktree of a cached bare, blobless
+    clone of repo_path, leaving the original working tree untouched.
+    commit_hash must be a full commit hash (see resolve_commit): refs in the bare
+    clone are only as fresh as its last fetch.
+    Returns the path to the worktree, or None if an error occurs.
+    """
+    if not _GIT:
+        print(_GIT_NOT_FOUND)
+        return None
+    if not _SHA_RE.fullmatch(commit_hash):
         print(
-            f"{Colors.RED}An unexpected error occurred during Git checkout: {e}{Colors.RESET}"
+            f"{RED}Error: '{commit_hash}' is not a full commit hash. Cannot check out a worktree.{RESET}"
         )
-        return False
+        return None
 
+    # Only needed for the clone URL; imported here to keep it off the CLI's startup path
+    import pathlib
 
-def get_current_git_commit_hash(repo_path):
+    bare_path = _bare_cache_path(repo_path)
+    project_name = os.path.basename(os.path.realpath(repo_path))
+    worktree_path = _WORKTREES.get((bare_path, commit_hash))
+    if worktree_path and os.path.isdir(worktree_path):
+        print(f"{GREEN}Reusing worktree for {commit_hash}:{RESET} {worktree_path}")
+        return worktree_path
+
+    print(
+        f"{BLUE}Attempting to check out commit:{RESET} {BOLD}{commit_hash}{RESET} {BLUE}from bare cache '{bare_path}'...{RESET}"
+    )
+    try:
+        if not os.path.isdir(bare_path):
+            os.makedirs(BARE_CACHE_DIR, exist_ok=True)
+            subprocess.run(
+                [
+                    _GIT,
+                    "clone",
+                    "--bare",
+                    "--filter=blob:none",
+                    pathlib.Path(os.path.realpath(repo_path)).as_uri(),
+                    bare_path,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        else:
+            known = subprocess.run(
+                [_GIT, "-C", bare_path, "cat-file", "-e", f"{commit_hash}^{{commit}}"],
+                capture_output=True,
+            )
+            if known.returncode != 0:
+                # The commit is fetched by hash, so it arrives even if no branch or tag points at it
+                subprocess.run(
+                    [
+                        _GIT,
+                        "-C",
+                        bare_path,
+                        "fetch",
+                        "origin",
+                        "+refs/heads/*:refs/heads/*",
+                        "+refs/tags/*:refs/tags/*",
+                        commit_hash,
+                    ],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+
+        subprocess.run(
+            [_GIT, "-C", bare_path, "worktree", "prune"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Keep the worktree directory name equal to the project name (used for WORKDIR)
+        worktree_root = tempfile.mkdtemp(prefix="repro-build-")
+        worktree_path = os.path.join(worktree_root, project_name)
+        try:
+            subprocess.run(
+                [
+                    _GIT,
+                    "-C",
+                    bare_path,
+                    "worktree",
+                    "add",
+                    "--detach",
+                    worktree_path,
+                    commit_hash,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError:
+            shutil.rmtree(worktree_root, ignore_errors=True)
+            raise
+        _WORKTREES[(bare_path, commit_hash)] = worktree_path
+        print(f"{GREEN}Worktree checkout successful:{RESET} {worktree_path}")
+        return worktree_path
+    except subprocess.CalledProcessError as e:
+        print(f"{RED}Error during worktree checkout of '{commit_hash}':{RESET}")
+        print(f"{RED}Command: {' '.join(e.cmd)}{RESET}")
+        print(f"{RED}Stderr:\n{e.stderr}{RESET}")
+        return None
+    except Exception as e:
+        print(f"{RED}An unexpected error occurred during worktree checkout: {e}{RESET}")
+        return None
+
+
+@atexit.register
+def remove_worktrees():
     """
-    Gets the current full commit hash of the Git repository at repo_path.
-    Returns the commit hash string or None if not a Git repo or error occurs.
+    Removes the worktrees created by checkout_worktree this session: each is
+    unregistered from its bare clone and its temporary directory is deleted.
+    Runs automatically when the CLI exits.
+    """
+    for (bare_path, _), worktree_path in _WORKTREES.items():
+        if _GIT:
+            subprocess.run(
+                [_GIT, "-C", bare_path, "worktree", "remove", "--force", worktree_path],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        shutil.rmtree(os.path.dirname(worktree_path), ignore_errors=True)
+    _WORKTREES.clear()
+
+
+def _head_sha(repo_path):
     """
-    if not os.path.isdir(os.path.join(repo_path, ".git")):
+    Resolves HEAD by reading .git/HEAD and the ref it points to (loose or packed),
+    without spawning git. Returns None when HEAD cannot be resolved this way.
+    """
+    git_dir = os.path.join(repo_path, ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r", encoding="utf-8") as f:
+            head = f.read().strip()
+        if head.startswith("ref: "):
+            ref = head[5:]
+            try:
+                with open(os.path.join(git_dir, ref), "r", encoding="utf-8") as f:
+                    sha = f.read().strip()
+            except FileNotFoundError:
+                sha = None
+                with open(
+                    os.path.join(git_dir, "packed-refs"), "r", encoding="utf-8"
+                ) as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 2 and parts[1] == ref:
+                            sha = parts[0]
+                            break
+        else:
+            sha = head
+    except OSError:
         return None
 
+    if sha and _SHA_RE.fullmatch(sha):
+        return sha
+    return None
+
+
+def _head_state(repo_path):
+    """
+    Returns the modification times of .git/HEAD and the HEAD reflog.
+    One of them changes whenever HEAD moves (checkout, commit, reset), so the
+    tuple is used as a cache key for HEAD lookups.
+    """
+    state = []
+    for name in ("HEAD", os.path.join("logs", "HEAD")):
+        try:
+            state.append(os.stat(os.path.join(repo_path, ".git", name)).st_mtime_ns)
+        except OSError:
+            state.append(None)
+    return tuple(state)
+
+
+@functools.lru_cache(maxsize=None)
+def _rev_parse_head(repo_path, head_state):
+    """
+    Runs 'git rev-parse HEAD' in repo_path. Results are memoized per (repo_path, head_state).
+    """
+    if not _GIT:
+        print(
+            f"{YELLOW}Warning: 'git' command not found. Cannot auto-detect commit hash.{RESET}"
+        )
+        return None
     try:
         result = subprocess.run(
-            ["git", "rev-parse", "HEAD"],
+            [_GIT, "rev-parse", "HEAD"],
             cwd=repo_path,
             capture_output=True,
             text=True,
@@ -67,16 +315,62 @@ def get_current_git_commit_hash(repo_path):
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         print(
-            f"{Colors.YELLOW}Warning: Could not get current Git commit hash for '{repo_path}': {e.stderr.strip()}{Colors.RESET}"
+            f"{YELLOW}Warning: Could not get current Git commit hash for '{repo_path}': {e.stderr.strip()}{RESET}"
         )
         return None
-    except FileNotFoundError:
+    except Exception as e:
         print(
-            f"{Colors.YELLOW}Warning: 'git' command not found. Cannot auto-detect commit hash.{Colors.RESET}"
+            f"{YELLOW}Warning: An unexpected error occurred while getting Git commit hash: {e}{RESET}"
         )
         return None
-    except Exception as e:
+
+
+def get_current_git_commit_hash(repo_path):
+    """
+    Gets the current full commit hash of the Git repository at repo_path.
+    Returns the commit hash string or None if not a Git repo or error occurs.
+    """
+    if not is_git_repo(repo_path):
+        return None
+
+    sha = _head_sha(repo_path)
+    if sha:
+        return sha
+    # Unusual layouts (e.g. SHA-256 repositories) still go through git itself
+    return _rev_parse_head(os.path.realpath(repo_path), _head_state(repo_path))
+
+
+def _rev_parse_commit(repo_path, ref):
+    """
+    Resolves ref to a full commit hash with 'git rev-parse'.
+    Not memoized: branches and relative refs such as HEAD~1 move between calls.
+    """
+    if not _GIT:
         print(
-            f"{Colors.YELLOW}Warning: An unexpected error occurred while getting Git commit hash: {e}{Colors.RESET}"
+            f"{YELLOW}Warning: 'git' command not found. Cannot resolve '{ref}'.{RESET}"
+        )
+        return None
+    try:
+        result = subprocess.run(
+            [_GIT, "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
         )
+        return result.stdout.strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def resolve_commit(repo_path, ref):
+    """
+    Resolves a commit hash, abbreviated hash, branch or tag to a full commit hash.
+    A full 40-character hash is returned as-is without invoking git.
+    Returns None if the ref cannot be resolved.
+    """
+    if _SHA_RE.fullmatch(ref.lower()):
+        return ref.lower()
+    if not is_git_repo(repo_path):
         return None
+    return _rev_parse_commit(os.path.realpath(repo_path), ref)
@@ -1,35 +1,180 @@
+import collections
+import dataclasses
+import functools
+import itertools
 import os
-import yaml
-from cli_colors import Colors
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from cli_colors import init_colors, RESET, RED, GREEN, YELLOW, BLUE, CYAN, BOLD
+from cli_utils import QUIT, parse_choice
 
+# Skipped along with hidden directories (.git, .svn, .hg, ...); see _is_skipped_dir.
+# Dependency and build output trees are large and never hold the project's CI configuration.
+_EXCLUDED_DIRS = frozenset(
+    {"node_modules", "venv", "__pycache__", "dist", "build", "target"}
+)
 
-def list_subdirectories(path):
+# Fixed parts of the directory menu, formatted once at import
+_MENU_HEADER = (
+    f"\n{BLUE}Detected subdirectories (select by number or enter path):{RESET}"
+)
+_YAML_LABEL = f" {CYAN}(YAML Project){RESET}"
+_PROMPT_NAV = f"{CYAN}Enter a number, a path, '.', '..', or 'q' to quit: {RESET}"
+_MENU_FOOTER = (
+    f"  {YELLOW}[.]{RESET} Stay in current directory (select if this is your project)",
+    f"  {YELLOW}[..]{RESET} Go up one level",
+    f"  {YELLOW}[q]{RESET} Quit",
+)
+
+# Every upper/lower-case spelling of the YAML suffixes, so file names need no lowercasing
+_YAML_EXTS = frozenset(
+    "".join(chars)
+    for ext in (".yml", ".yaml")
+    for chars in itertools.product(*({c, c.upper()} for c in ext))
+)
+
+# A listed subdirectory: absolute path, directory name and whether it is a YAML project
+SubdirEntry = collections.namedtuple("SubdirEntry", ["path", "name", "has_yaml"])
+
+
+@dataclasses.dataclass
+class ProjectInfo:
     """
-    Lists all subdirectories in the given path.
-    Returns a list of absolute paths to the subdirectories.
+    Information gathered about a project as the CLI works through its steps.
+    Created by find_project_info; later steps fill in the remaining fields.
+    """
+
+    node_version: Optional[str] = None
+    project_path: str = ""
+    project_name: str = ""
+    package_manager: Optional[str] = None
+    yaml_files: list = dataclasses.field(default_factory=list)
+    selected_yaml_file: Optional[str] = None
+    project_type: list = dataclasses.field(default_factory=list)
+    build_steps_from_yaml: list = dataclasses.field(default_factory=list)
+    parsed_jobs_info: dict = dataclasses.field(default_factory=dict)
+    commit_hash: Optional[str] = None
+
+    @functools.cached_property
+    def yaml_files_set(self):
+        """
+        yaml_files as a frozenset, for membership checks. Derived, so it is not a field
+        and stays out of dataclasses.asdict().
+        """
+        return frozenset(self.yaml_files)
+
+
+# (path, st_mtime_ns) -> sorted (path, name) pairs of its subdirectories
+_SUBDIR_CACHE = {}
+
+# (path, st_mtime_ns) -> whether the directory contains YAML files
+_YAML_PROJECT_CACHE = {}
+
+# Thread pool for the YAML-project probes, created on first use
+_PROBE_EXECUTOR = None
+
+
+def _probe_executor():
+    """
+    Returns the shared thread pool used to probe subdirectories, creating it on first use.
+    """
+    global _PROBE_EXECUTOR
+    if _PROBE_EXECUTOR is None:
+        _PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4))
+    return _PROBE_EXECUTOR
+
+
+def _is_skipped_dir(name):
+    """
+    Returns True for directory names that are never listed or searched: hidden
+    directories (including .git) and the entries of _EXCLUDED_DIRS.
+    """
+    return name[:1] == "." or name in _EXCLUDED_DIRS
+
+
+def _scan_subdirectories(path):
+    """
+    Returns the sorted (path, name) pairs of the listable subdirectories of path,
+    or None if the directory could not be read.
     """
     subdirs = []
     try:
-        for item in os.listdir(path):
-            item_path = os.path.join(path, item)
-            if os.path.isdir(item_path):
+        with os.scandir(path) as entries:
+            for entry in entries:
                 # Exclude common hidden directories or system directories
-                if not item.startswith(".") and item not in [
-                    "node_modules",
-                    "venv",
-                    "__pycache__",
-                    ".git",
-                ]:
-                    subdirs.append(item_path)
+                name = entry.name
+                if _is_skipped_dir(name):
+                    continue
+                # DirEntry.is_dir() reuses the type from the directory read; only symlinks are stat'ed
+                if entry.is_dir():
+                    subdirs.append((entry.path, name))
     except FileNotFoundError:
-        print(f"{Colors.RED}Error: Directory not found at {path}{Colors.RESET}")
+        print(f"{RED}Error: Directory not found at {path}{RESET}")
+        return None
     except PermissionError:
-        print(f"{Colors.RED}Error: Permission denied to access {path}{Colors.RESET}")
+        print(f"{RED}Error: Permission denied to access {path}{RESET}")
+        return None
     except Exception as e:
         print(
-            f"{Colors.RED}An unexpected error occurred while listing directories: {e}{Colors.RESET}"
+            f"{RED}An unexpected error occurred while listing directories: {e}{RESET}"
         )
-    return sorted(subdirs)
+        return None
+    subdirs.sort()
+    return subdirs
+
+
+def list_subdirectories(path):
+    """
+    Lists all subdirectories in the given path.
+    Returns a list of SubdirEntry tuples sorted by path.
+    """
+    try:
+        cache_key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        cache_key = None
+    # Only the listing is cached; the YAML probes below are checked against each child's own mtime
+    subdirs = _SUBDIR_CACHE.get(cache_key)
+    if subdirs is None:
+        subdirs = _scan_subdirectories(path)
+        if subdirs is None:
+            subdirs = []
+        elif cache_key is not None:
+            _SUBDIR_CACHE[cache_key] = subdirs
+    paths = [subdir for subdir, _ in subdirs]
+    # The probes are filesystem-bound, so threads overlap their directory scans
+    if len(paths) > 1:
+        has_yaml = list(_probe_executor().map(_is_yaml_project, paths))
+    else:
+        has_yaml = [_is_yaml_project(subdir) for subdir in paths]
+    return [
+        SubdirEntry(subdir, name, flag)
+        for (subdir, name), flag in zip(subdirs, has_yaml)
+    ]
+
+
+def _walk_yaml_files(root):
+    """
+    Yields the paths of YAML files below root, skipping hidden and excluded directories.
+    Uses os.scandir directly so entry types come from the directory read instead of extra stats.
+    Unreadable subdirectories are skipped, as os.walk does.
+    """
+    pending = [root]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        name = entry.name
+                        if not _is_skipped_dir(name) and not entry.is_symlink():
+                            pending.append(entry.path)
+                    else:
+                        name = entry.name
+                        dot = name.rfind(".")
+                        if dot != -1 and name[dot:] in _YAML_EXTS:
+                            yield entry.path
+        except OSError:
+            continue
 
 
 def find_yaml_files(project_path):
@@ -37,61 +182,78 @@ def find_yaml_files(project_path):
     Scans the project directory and its subdirectories for all YAML configuration files.
     Returns a list of paths to detected YAML files.
     """
-    yaml_files = []
-    excluded_dirs = ["node_modules", "venv", ".git", "__pycache__"]
-
     try:
-        for root, dirs, files in os.walk(project_path):
-            dirs[:] = [
-                d for d in dirs if d not in excluded_dirs and not d.startswith(".")
-            ]
-
-            for file in files:
-                if file.lower().endswith((".yml", ".yaml")):
-                    full_path = os.path.join(root, file)
-                    yaml_files.append(full_path)
+        yaml_files = list(_walk_yaml_files(project_path))
     except Exception as e:
+        yaml_files = []
         print(
-            f"{Colors.YELLOW}Warning: Could not scan directory '{project_path}' for YAML files: {e}{Colors.RESET}"
+            f"{YELLOW}Warning: Could not scan directory '{project_path}' for YAML files: {e}{RESET}"
         )
 
     return sorted(yaml_files)
 
 
+def _has_yaml_files(path):
+    """
+    Returns True as soon as one YAML file is found below path, without walking the rest of the tree.
+    """
+    return next(_walk_yaml_files(path), None) is not None
+
+
+def _is_yaml_project(path):
+    """
+    Returns True if path contains YAML files (i.e. is a recognized project).
+    Results are cached per (path, directory mtime) so menu redraws don't rescan the same trees.
+    The mtime only changes for direct children, so this is used for menu labels only;
+    a selection is checked again with _has_yaml_files.
+    """
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return False
+
+    is_project = _YAML_PROJECT_CACHE.get(key)
+    if is_project is None:
+        is_project = _has_yaml_files(path)
+        _YAML_PROJECT_CACHE[key] = is_project
+    return is_project
+
+
 def find_project_info(project_path):
     """
     Finds project-related files (YAML files) and extracts necessary info.
     A project is considered valid ONLY if it has YAML files.
+    Returns a ProjectInfo, or None if no YAML files were found.
     """
     yaml_files = find_yaml_files(project_path)
     has_yaml_files = bool(yaml_files)
 
     if not has_yaml_files:
         print(
-            f"{Colors.RED}Error: No common YAML files found in '{project_path}'. "
-            "This directory does not appear to be a recognized project type.{Colors.RESET}"
+            f"{RED}Error: No common YAML files found in '{project_path}'. "
+            "This directory does not appear to be a recognized project type.{RESET}"
         )
         return None
 
     project_type = ["yaml"]
-    print(f"{Colors.GREEN}Detected YAML configuration files:{Colors.RESET}")
+    print(f"{GREEN}Detected YAML configuration files:{RESET}")
+    # The files were found below project_path, so slicing off the prefix gives the relative path
+    prefix = project_path.rstrip(os.sep) + os.sep
+    prefix_len = len(prefix)
     for yf in yaml_files:
-        print(f"  - {os.path.relpath(yf, project_path)}")
-
-    all_jobs_parsed_info = {}
-    # Note: parse_yaml_for_build_info is now in yaml_processing.py
+        rel = (
+            yf[prefix_len:]
+            if yf.startswith(prefix)
+            else os.path.relpath(yf, project_path)
+        )
+        print(f"  - {rel}")
 
-    project_info = {
-        "node_version": None,
-        "project_path": project_path,
-        "package_manager": None,
-        "yaml_files": yaml_files,
-        "selected_yaml_file": None,
-        "project_type": project_type,
-        "build_steps_from_yaml": [],
-        "parsed_jobs_info": all_jobs_parsed_info,  # This will be populated later
-    }
-    return project_info
+    return ProjectInfo(
+        project_path=project_path,
+        project_name=os.path.basename(project_path),
+        yaml_files=yaml_files,
+        project_type=project_type,
+    )
 
 
 def get_project_directory_interactive():
@@ -99,124 +261,98 @@ def get_project_directory_interactive():
     Prompts the user to enter the project directory path,
     offering a list of subdirectories to choose from.
     """
+    # Kept absolute for the whole session
     current_path = os.getcwd()
+    # The listing is only refreshed when the user navigates to another directory
+    listed_path = None
+    subdirs = []
     while True:
-        print(f"\n{Colors.BOLD}Current directory:{Colors.RESET} {current_path}")
-        subdirs = list_subdirectories(current_path)
+        if current_path != listed_path:
+            subdirs = list_subdirectories(current_path)
+            listed_path = current_path
 
+        # Render the whole menu into one buffer and write it with a single call
+        lines = [f"\n{BOLD}Current directory:{RESET} {current_path}"]
         if subdirs:
-            print(
-                f"\n{Colors.BLUE}Detected subdirectories (select by number or enter path):{Colors.RESET}"
-            )
-            for i, subdir in enumerate(subdirs):
-                has_yaml = bool(find_yaml_files(subdir))
-
-                label = ""
-                color = Colors.YELLOW
-                if has_yaml:
-                    label = f" {Colors.CYAN}(YAML Project){Colors.RESET}"
-                    color = Colors.BLUE
+            lines.append(_MENU_HEADER)
+            for i, subdir in enumerate(subdirs, 1):
+                if subdir.has_yaml:
+                    lines.append(f"  {BLUE}[{i}]{RESET} {subdir.name}{_YAML_LABEL}")
+                else:
+                    lines.append(f"  {YELLOW}[{i}]{RESET} {subdir.name}")
+        else:
+            lines.append(f"{YELLOW}No subdirectories found in '{current_path}'.{RESET}")
+        lines.extend(_MENU_FOOTER)
+        sys.stdout.write("\n".join(lines) + "\n")
 
-                print(
-                    f"  {color}[{i+1}]{Colors.RESET} {os.path.basename(subdir)}{label}"
-                )
+        choice = input(_PROMPT_NAV).strip()
+        index = parse_choice(choice, len(subdirs))
 
-            print(
-                f"  {Colors.YELLOW}[.]{Colors.RESET} Stay in current directory (select if this is your project)"
-            )
-            print(f"  {Colors.YELLOW}[..]{Colors.RESET} Go up one level")
-            print(f"  {Colors.YELLOW}[q]{Colors.RESET} Quit")
-        else:
-            print(
-                f"{Colors.YELLOW}No subdirectories found in '{current_path}'.{Colors.RESET}"
-            )
-            print(
-                f"  {Colors.YELLOW}[.]{Colors.RESET} Stay in current directory (select if this is your project)"
-            )
-            print(f"  {Colors.YELLOW}[..]{Colors.RESET} Go up one level")
-            print(f"  {Colors.YELLOW}[q]{Colors.RESET} Quit")
-
-        choice = input(
-            f"{Colors.CYAN}Enter a number, a path, '.', '..', or 'q' to quit: {Colors.RESET}"
-        ).strip()
-
-        if choice.lower() == "q":
+        if index == QUIT:
             return None
 
         if choice == ".":
-            project_abs_path = os.path.abspath(current_path)
+            project_abs_path = current_path
             if os.path.isdir(project_abs_path):
-                if bool(find_yaml_files(project_abs_path)):
+                if _has_yaml_files(project_abs_path):
                     print(
-                        f"{Colors.GREEN}Selected project:{Colors.RESET} {os.path.basename(project_abs_path)}"
+                        f"{GREEN}Selected project:{RESET} {os.path.basename(project_abs_path)}"
                     )
                     return project_abs_path
                 else:
                     print(
-                        f"{Colors.RED}Error: Current directory '{os.path.basename(project_abs_path)}' is not a recognized project (no common YAML files found). Please select a valid project or navigate.{Colors.RESET}"
+                        f"{RED}Error: Current directory '{os.path.basename(project_abs_path)}' is not a recognized project (no common YAML files found). Please select a valid project or navigate.{RESET}"
                     )
                     continue
             else:
                 print(
-                    f"{Colors.RED}Error: Current path '{project_abs_path}' is not a valid directory.{Colors.RESET}"
+                    f"{RED}Error: Current path '{project_abs_path}' is not a valid directory.{RESET}"
                 )
                 continue
         elif choice == "..":
-            parent_path = os.path.abspath(os.path.join(current_path, os.pardir))
+            # current_path is always absolute, so the parent is a pure string operation
+            parent_path = os.path.dirname(current_path)
             if os.path.isdir(parent_path):
                 current_path = parent_path
             else:
                 print(
-                    f"{Colors.RED}Error: Cannot go up from '{current_path}'. Already at root or invalid path.{Colors.RESET}"
+                    f"{RED}Error: Cannot go up from '{current_path}'. Already at root or invalid path.{RESET}"
                 )
             continue
-        elif choice.isdigit():
-            try:
-                index = int(choice) - 1
-                if 0 <= index < len(subdirs):
-                    selected_path = subdirs[index]
-                    if bool(find_yaml_files(selected_path)):
-                        print(
-                            f"{Colors.GREEN}Selected project:{Colors.RESET} {os.path.basename(selected_path)}"
-                        )
-                        return selected_path
-                    else:
-                        print(
-                            f"{Colors.YELLOW}Selected directory '{os.path.basename(selected_path)}' is not a recognized project. Navigating into it.{Colors.RESET}"
-                        )
-                        current_path = selected_path
-                        continue
-                else:
-                    print(
-                        f"{Colors.RED}Invalid number. Please try again.{Colors.RESET}"
-                    )
-            except ValueError:
+        elif index is not None:
+            selected = subdirs[index]
+            selected_path = selected.path
+            # The menu label may be stale for YAML files added deeper in the tree
+            if _has_yaml_files(selected_path):
+                print(f"{GREEN}Selected project:{RESET} {selected.name}")
+                return selected_path
+            else:
                 print(
-                    f"{Colors.RED}Invalid input. Please enter a number, a path, '.', '..', or 'q'.{Colors.RESET}"
+                    f"{YELLOW}Selected directory '{selected.name}' is not a recognized project. Navigating into it.{RESET}"
                 )
+                current_path = selected_path
+                continue
+        elif choice.isdigit():
+            print(f"{RED}Invalid number. Please try again.{RESET}")
         else:
-            input_path = choice.strip('"').strip("'")
+            input_path = choice.strip("\"'")
 
-            if os.path.isabs(input_path):
-                project_abs_path = os.path.abspath(input_path)
-            else:
-                project_abs_path = os.path.abspath(
-                    os.path.join(current_path, input_path)
-                )
+            # join() keeps an absolute input as-is; current_path is already absolute
+            project_abs_path = os.path.normpath(os.path.join(current_path, input_path))
 
             if not os.path.isdir(project_abs_path):
                 print(
-                    f"{Colors.RED}Error: The provided path '{project_abs_path}' is not a valid directory. Please try again.{Colors.RESET}"
+                    f"{RED}Error: The provided path '{project_abs_path}' is not a valid directory. Please try again.{RESET}"
                 )
             else:
-                if bool(find_yaml_files(project_abs_path)):
+                if _has_yaml_files(project_abs_path):
                     print(
-                        f"{Colors.GREEN}Selected project:{Colors.RESET} {os.path.basename(project_abs_path)}"
+                        f"{GREEN}Selected project:{RESET} {os.path.basename(project_abs_path)}"
                     )
                     return project_abs_path
                 else:
                     print(
-                        f"{Colors.YELLOW}Entered directory '{os.path.basename(project_abs_path)}' is not a recognized project. Navigating into it.{Colors.RESET}"
+                        f"{YELLOW}Entered directory '{os.path.basename(project_abs_path)}' is not a recognized project. Navigating into it.{RESET}"
                     )
                     current_path = project_abs_path
                     continue
@@ -224,13 +360,12 @@ def get_project_directory_interactive():
 
 # This block allows project_discovery.py to be run directly for testing its interactive part
 if __name__ == "__main__":
-    print(
-        f"{Colors.BOLD}--- Running project_discovery.py directly for testing ---{Colors.RESET}"
-    )
+    init_colors()
+    print(f"{BOLD}--- Running project_discovery.py directly for testing ---{RESET}")
     selected_dir = get_project_directory_interactive()
     if selected_dir:
         print(
-            f"\n{Colors.GREEN}Interactive selection complete. Selected directory: {selected_dir}{Colors.RESET}"
+            f"\n{GREEN}Interactive selection complete. Selected directory: {selected_dir}{RESET}"
         )
     else:
-        print(f"\n{Colors.YELLOW}No directory selected.{Colors.RESET}")
+        print(f"\n{YELLOW}No directory selected.{RESET}")
@@ -1,25 +1,39 @@
 import argparse
+import dataclasses
 import os
 import sys
 
 # Import modules
-from cli_colors import Colors
+from cli_colors import init_colors, RESET, RED, GREEN, YELLOW, BLUE, CYAN, BOLD
+from cli_utils import select_from, write_atomic
 from project_discovery import get_project_directory_interactive, find_project_info
-from git_operations import git_checkout, get_current_git_commit_hash
-from yaml_processing import get_yaml_file_selection, parse_yaml_for_build_info
+from git_operations import (
+    git_checkout,
+    checkout_worktree,
+    get_current_git_commit_hash,
+    is_git_repo,
+    resolve_commit,
+)
+from yaml_processing import get_yaml_file_selection
+from yaml_cache import load_cached
 from docker_management import (
     generate_dockerfile_from_yaml_info,
+    detect_package_manager,
+    ensure_dockerignore,
     build_docker_image,
     run_docker_container,
 )
 
+# Generated Dockerfiles are written next to this script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
 def main():
     """
     Main function to parse command-line arguments and start the process.
     """
     parser = argparse.ArgumentParser(
-        description=f"{Colors.BOLD}CLI for building reproducible project environments with Docker.{Colors.RESET}"
+        description=f"{BOLD}CLI for building reproducible project environments with Docker.{RESET}"
     )
     parser.add_argument(
         "project_dir",
@@ -43,8 +57,14 @@ def main():
         default="Dockerfile",
         help="Name of the Dockerfile to generate (default: Dockerfile or <project_name>_<commit_hash>.Dockerfile).",
     )
+    parser.add_argument(
+        "--bare-cache",
+        action="store_true",
+        help="Check out the commit into a temporary worktree of a cached bare clone instead of the project's own working tree.",
+    )
 
     args = parser.parse_args()
+    init_colors()
 
     while True:  # Loop to allow re-selection of project/commit/YAML
         project_abs_path = None
@@ -59,41 +79,44 @@ def main():
             # For initial validation, we just check if it's a directory.
             if not os.path.isdir(project_abs_path):
                 print(
-                    f"{Colors.RED}Error: The provided path '{project_abs_path}' is not a valid directory.{Colors.RESET}"
+                    f"{RED}Error: The provided path '{project_abs_path}' is not a valid directory.{RESET}"
                 )
                 return  # Exit if argument path is invalid
             print(
-                f"{Colors.GREEN}Selected project from argument:{Colors.RESET} {os.path.basename(project_abs_path)}"
+                f"{GREEN}Selected project from argument:{RESET} {os.path.basename(project_abs_path)}"
             )
         else:
             project_abs_path = get_project_directory_interactive()
             if not project_abs_path:
-                print(
-                    f"{Colors.YELLOW}Operation cancelled by user. Exiting.{Colors.RESET}"
-                )
+                print(f"{YELLOW}Operation cancelled by user. Exiting.{RESET}")
                 return  # Exit main if user quits interactive selection
 
         print(
-            f"{Colors.GREEN}CLI initialized. Analyzing project directory:{Colors.RESET} {Colors.BOLD}{project_abs_path}{Colors.RESET}"
+            f"{GREEN}CLI initialized. Analyzing project directory:{RESET} {BOLD}{project_abs_path}{RESET}"
         )
 
         # Step 2: Get commit hash (from arg or interactively)
         if args.commit_hash:
-            commit_hash_to_use = args.commit_hash
+            commit_hash_to_use = resolve_commit(project_abs_path, args.commit_hash)
+            if not commit_hash_to_use:
+                print(
+                    f"{RED}Error: Could not resolve '{args.commit_hash}' to a commit in '{project_abs_path}'.{RESET}"
+                )
+                return
             print(
-                f"{Colors.GREEN}Using commit hash from argument:{Colors.RESET} {Colors.BOLD}{commit_hash_to_use}{Colors.RESET}"
+                f"{GREEN}Using commit hash from argument:{RESET} {BOLD}{commit_hash_to_use}{RESET}"
             )
         else:
             # Check if it's a Git repo before asking for commit hash
-            if os.path.isdir(os.path.join(project_abs_path, ".git")):
+            if is_git_repo(project_abs_path):
                 current_repo_commit = get_current_git_commit_hash(project_abs_path)
                 if current_repo_commit:
                     print(
-                        f"{Colors.CYAN}Detected current Git commit: {current_repo_commit[:7]}...{Colors.RESET}"
+                        f"{CYAN}Detected current Git commit: {current_repo_commit[:7]}...{RESET}"
                     )
                     prompt_choice = (
                         input(
-                            f"{Colors.CYAN}Use this commit ({current_repo_commit[:7]}...)? [Y/n/q] (or enter a different hash): {Colors.RESET}"
+                            f"{CYAN}Use this commit ({current_repo_commit[:7]}...)? [Y/n/q] (or enter a different hash): {RESET}"
                         )
                         .strip()
                         .lower()
@@ -101,257 +124,224 @@ def main():
                     if prompt_choice == "y" or prompt_choice == "":
                         commit_hash_to_use = current_repo_commit
                         print(
-                            f"{Colors.GREEN}Using current Git commit: {commit_hash_to_use[:7]}...{Colors.RESET}"
+                            f"{GREEN}Using current Git commit: {commit_hash_to_use[:7]}...{RESET}"
                         )
                     elif prompt_choice == "n":
                         commit_hash_to_use = input(
-                            f"{Colors.CYAN}Enter the Git commit hash for reproduction (leave blank for current state): {Colors.RESET}"
+                            f"{CYAN}Enter the Git commit hash for reproduction (leave blank for current state): {RESET}"
                         ).strip()
                         if not commit_hash_to_use:
                             print(
-                                f"{Colors.YELLOW}No commit hash provided. Proceeding with current state of the project.{Colors.RESET}"
+                                f"{YELLOW}No commit hash provided. Proceeding with current state of the project.{RESET}"
                             )
                         else:
                             print(
-                                f"{Colors.GREEN}Using commit hash from interactive input:{Colors.RESET} {Colors.BOLD}{commit_hash_to_use}{Colors.RESET}"
+                                f"{GREEN}Using commit hash from interactive input:{RESET} {BOLD}{commit_hash_to_use}{RESET}"
                             )
                     elif prompt_choice == "q":
-                        print(
-                            f"{Colors.YELLOW}Operation cancelled by user. Exiting.{Colors.RESET}"
-                        )
+                        print(f"{YELLOW}Operation cancelled by user. Exiting.{RESET}")
                         return
                     else:
                         commit_hash_to_use = prompt_choice
                         print(
-                            f"{Colors.GREEN}Using provided Git commit: {commit_hash_to_use[:7]}...{Colors.RESET}"
+                            f"{GREEN}Using provided Git commit: {commit_hash_to_use[:7]}...{RESET}"
                         )
                 else:
                     commit_hash_to_use = input(
-                        f"{Colors.CYAN}Enter the Git commit hash for reproduction (leave blank for current state): {Colors.RESET}"
+                        f"{CYAN}Enter the Git commit hash for reproduction (leave blank for current state): {RESET}"
                     ).strip()
                     if not commit_hash_to_use:
                         print(
-                            f"{Colors.YELLOW}No commit hash provided. Proceeding with current state of the project.{Colors.RESET}"
+                            f"{YELLOW}No commit hash provided. Proceeding with current state of the project.{RESET}"
                         )
                     else:
                         print(
-                            f"{Colors.GREEN}Using commit hash from interactive input:{Colors.RESET} {Colors.BOLD}{commit_hash_to_use}{Colors.RESET}"
+                            f"{GREEN}Using commit hash from interactive input:{RESET} {BOLD}{commit_hash_to_use}{RESET}"
                         )
             else:
                 print(
-                    f"{Colors.YELLOW}Project is not a Git repository. Cannot use commit hash.{Colors.RESET}"
+                    f"{YELLOW}Project is not a Git repository. Cannot use commit hash.{RESET}"
                 )
                 commit_hash_to_use = None
 
         # Step 3: Perform Git checkout if a commit hash is available
-        if commit_hash_to_use:
+        if commit_hash_to_use and args.bare_cache:
+            # Branches and tags are resolved in the project itself; the bare clone's copies may be stale
+            resolved_hash = resolve_commit(project_abs_path, commit_hash_to_use)
+            if resolved_hash:
+                commit_hash_to_use = resolved_hash
+                worktree_path = checkout_worktree(project_abs_path, resolved_hash)
+            else:
+                print(
+                    f"{RED}Error: Could not resolve '{commit_hash_to_use}' to a commit in '{project_abs_path}'.{RESET}"
+                )
+                worktree_path = None
+            if not worktree_path:
+                print(
+                    f"{RED}Worktree checkout failed. Please select another project or try again.{RESET}"
+                )
+                # With the project and commit both given as arguments, a retry would fail the same way
+                if args.project_dir and args.commit_hash:
+                    return
+                continue
+            project_abs_path = worktree_path
+        elif commit_hash_to_use:
             if not git_checkout(project_abs_path, commit_hash_to_use):
                 print(
-                    f"{Colors.RED}Git checkout failed. Please select another project or try again.{Colors.RESET}"
+                    f"{RED}Git checkout failed. Please select another project or try again.{RESET}"
                 )
+                if args.project_dir and args.commit_hash:
+                    return
                 continue
 
         # Step 4: Find project info based on the potentially checked-out state
         project_info = find_project_info(project_abs_path)
 
         if project_info:
-            project_info["commit_hash"] = commit_hash_to_use
+            project_info.commit_hash = commit_hash_to_use
 
             # Step 5: Select YAML file for parsing
             if args.yaml_file:
-                arg_yaml_path = os.path.abspath(
+                arg_yaml_path = os.path.normpath(
                     os.path.join(project_abs_path, args.yaml_file)
                 )
-                if arg_yaml_path in project_info["yaml_files"]:
+                if arg_yaml_path in project_info.yaml_files_set:
                     selected_yaml_file_path = arg_yaml_path
                     print(
-                        f"{Colors.GREEN}Using YAML file from argument:{Colors.RESET} {os.path.basename(selected_yaml_file_path)}{Colors.RESET}"
+                        f"{GREEN}Using YAML file from argument:{RESET} {os.path.basename(selected_yaml_file_path)}{RESET}"
                     )
                 else:
                     print(
-                        f"{Colors.RED}Error: Specified YAML file '{args.yaml_file}' not found in the project or is not a recognized YAML file. Please select from the detected files.{Colors.RESET}"
+                        f"{RED}Error: Specified YAML file '{args.yaml_file}' not found in the project or is not a recognized YAML file. Please select from the detected files.{RESET}"
                     )
                     continue
-            elif len(project_info["yaml_files"]) == 1:
-                selected_yaml_file_path = project_info["yaml_files"][0]
+            elif len(project_info.yaml_files) == 1:
+                selected_yaml_file_path = project_info.yaml_files[0]
                 # Corrected line: Ensure the f-string is complete
                 print(
-                    f"{Colors.GREEN}Automatically selected single YAML file:{Colors.RESET} {os.path.basename(selected_yaml_file_path)}{Colors.RESET}"
+                    f"{GREEN}Automatically selected single YAML file:{RESET} {os.path.basename(selected_yaml_file_path)}{RESET}"
                 )
-            elif len(project_info["yaml_files"]) > 1:
+            elif len(project_info.yaml_files) > 1:
                 selected_yaml_file_path = get_yaml_file_selection(
-                    project_info["yaml_files"]
+                    project_info.yaml_files
                 )
                 if not selected_yaml_file_path:
                     print(
-                        f"{Colors.YELLOW}YAML file selection cancelled. Please select another project or try again.{Colors.RESET}"
+                        f"{YELLOW}YAML file selection cancelled. Please select another project or try again.{RESET}"
                     )
                     continue
             else:
                 print(
-                    f"{Colors.YELLOW}No YAML configuration files found in the selected project. Please select another project or navigate.{Colors.RESET}"
+                    f"{YELLOW}No YAML configuration files found in the selected project. Please select another project or navigate.{RESET}"
                 )
                 continue
 
-            project_info["selected_yaml_file"] = selected_yaml_file_path
+            project_info.selected_yaml_file = selected_yaml_file_path
 
             # Step 6: Parse the selected YAML file for build info and select job
             if selected_yaml_file_path:
-                parsed_jobs_info = parse_yaml_for_build_info(selected_yaml_file_path)
-                project_info["parsed_jobs_info"] = parsed_jobs_info
+                parsed_jobs_info = load_cached(selected_yaml_file_path)
+                project_info.parsed_jobs_info = parsed_jobs_info
 
                 selected_job_name = None
                 if len(parsed_jobs_info) == 1:
-                    selected_job_name = list(parsed_jobs_info.keys())[0]
+                    selected_job_name = next(iter(parsed_jobs_info))
                     print(
-                        f"{Colors.GREEN}Automatically selected single job '{selected_job_name}' from YAML file.{Colors.RESET}"
+                        f"{GREEN}Automatically selected single job '{selected_job_name}' from YAML file.{RESET}"
                     )
                 elif len(parsed_jobs_info) > 1:
-                    print(
-                        f"\n{Colors.BLUE}Multiple jobs detected in '{os.path.basename(selected_yaml_file_path)}'. Please select the build job:{Colors.RESET}"
+                    selected_job_name = select_from(
+                        list(parsed_jobs_info),
+                        f"\n{BLUE}Multiple jobs detected in '{os.path.basename(selected_yaml_file_path)}'. Please select the build job:{RESET}",
                     )
-                    job_names = list(parsed_jobs_info.keys())
-                    for i, job_n in enumerate(job_names):
-                        print(f"  {Colors.YELLOW}[{i+1}]{Colors.RESET} {job_n}")
-                    print(f"  {Colors.YELLOW}[q]{Colors.RESET} Quit")
-
-                    while True:
-                        job_choice = input(
-                            f"{Colors.CYAN}Enter a number or 'q' to quit: {Colors.RESET}"
-                        ).strip()
-                        if job_choice.lower() == "q":
-                            print(
-                                f"{Colors.YELLOW}Job selection cancelled. Please select another project or try again.{Colors.RESET}"
-                            )
-                            continue
-                        elif job_choice.isdigit():
-                            try:
-                                index = int(job_choice) - 1
-                                if 0 <= index < len(job_names):
-                                    selected_job_name = job_names[index]
-                                    print(
-                                        f"{Colors.GREEN}Selected job:{Colors.RESET} {selected_job_name}"
-                                    )
-                                    break
-                                else:
-                                    print(
-                                        f"{Colors.RED}Invalid number. Please choose a number from the list.{Colors.RESET}"
-                                    )
-                            except ValueError:
-                                print(
-                                    f"{Colors.RED}Invalid input. Please enter a number or 'q'.{Colors.RESET}"
-                                )
-                        else:
-                            print(
-                                f"{Colors.RED}Invalid input. Please enter a number or 'q'.{Colors.RESET}"
-                            )
+                    if selected_job_name is None:
+                        print(
+                            f"{YELLOW}Job selection cancelled. Please select another project or try again.{RESET}"
+                        )
+                        continue
+                    print(f"{GREEN}Selected job:{RESET} {selected_job_name}")
                 else:
                     print(
-                        f"{Colors.YELLOW}No jobs found in the selected YAML file. Cannot extract build steps.{Colors.RESET}"
+                        f"{YELLOW}No jobs found in the selected YAML file. Cannot extract build steps.{RESET}"
                     )
                     continue
 
                 if selected_job_name:
                     job_details = parsed_jobs_info.get(selected_job_name, {})
-                    project_info["build_steps_from_yaml"] = job_details.get("steps", [])
+                    project_info.build_steps_from_yaml = job_details.get("steps", [])
                     if job_details.get("node_version"):
-                        project_info["node_version"] = job_details["node_version"]
+                        project_info.node_version = job_details["node_version"]
                     else:
                         print(
-                            f"{Colors.YELLOW}Warning: No Node.js version detected in the selected job '{selected_job_name}'. Defaulting to 'lts'.{Colors.RESET}"
+                            f"{YELLOW}Warning: No Node.js version detected in the selected job '{selected_job_name}'. Defaulting to 'lts'.{RESET}"
                         )
-                        project_info["node_version"] = "lts"
+                        project_info.node_version = "lts"
                 else:
                     print(
-                        f"{Colors.RED}No build job selected. Cannot proceed with build analysis.{Colors.RESET}"
+                        f"{RED}No build job selected. Cannot proceed with build analysis.{RESET}"
                     )
                     continue
 
             else:
                 print(
-                    f"{Colors.RED}No YAML file selected for parsing. Cannot proceed with build analysis.{Colors.RESET}"
+                    f"{RED}No YAML file selected for parsing. Cannot proceed with build analysis.{RESET}"
                 )
                 continue
 
             # Step 7: Generate Dockerfile
-            project_name = os.path.basename(project_info["project_path"])
+            project_info.package_manager = detect_package_manager(project_abs_path)
+            project_name = project_info.project_name
             dockerfile_output_name = args.output_dockerfile
 
             if dockerfile_output_name == "Dockerfile":
                 dockerfile_output_name = project_name
-                if project_info["commit_hash"]:
-                    dockerfile_output_name += f"_{project_info['commit_hash'][:7]}"
+                if project_info.commit_hash:
+                    dockerfile_output_name += f"_{project_info.commit_hash[:7]}"
                 dockerfile_output_name += ".Dockerfile"
 
             dockerfile_content = generate_dockerfile_from_yaml_info(project_info)
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            dockerfile_path = os.path.join(script_dir, dockerfile_output_name)
+            dockerfile_path = os.path.join(SCRIPT_DIR, dockerfile_output_name)
 
             try:
-                with open(dockerfile_path, "w", encoding="utf-8") as f:
-                    f.write(dockerfile_content)
+                # Renamed into place, so an interrupted run never leaves a half-written Dockerfile behind
+                write_atomic(dockerfile_path, dockerfile_content.encode("utf-8"))
                 print(
-                    f"\n{Colors.GREEN}Dockerfile generated successfully at:{Colors.RESET} {Colors.BOLD}{dockerfile_path}{Colors.RESET}"
+                    f"\n{GREEN}Dockerfile generated successfully at:{RESET} {BOLD}{dockerfile_path}{RESET}"
                 )
                 print("\n--- Generated Dockerfile Content ---")
                 print(dockerfile_content)
                 print("------------------------------------\n")
             except IOError as e:
+                print(f"{RED}Error writing Dockerfile to {dockerfile_path}: {e}{RESET}")
                 print(
-                    f"{Colors.RED}Error writing Dockerfile to {dockerfile_path}: {e}{Colors.RESET}"
-                )
-                print(
-                    f"{Colors.YELLOW}Please ensure you have write permissions in the script's directory.{Colors.RESET}"
+                    f"{YELLOW}Please ensure you have write permissions in the script's directory.{RESET}"
                 )
                 continue
 
             # Step 8: Generate or update .dockerignore
-            dockerignore_path = os.path.join(project_abs_path, ".dockerignore")
-            ignore_entry = "node_modules/"
-
-            try:
-                if os.path.exists(dockerignore_path):
-                    with open(dockerignore_path, "r+", encoding="utf-8") as f:
-                        content = f.read()
-                        if ignore_entry not in content:
-                            f.write(f"\n{ignore_entry}")
-                            print(
-                                f"{Colors.GREEN}Added '{ignore_entry}' to existing .dockerignore file.{Colors.RESET}"
-                            )
-                        else:
-                            print(
-                                f"{Colors.YELLOW}'.dockerignore' already contains '{ignore_entry}'. No changes made.{Colors.RESET}"
-                            )
-                else:
-                    with open(dockerignore_path, "w", encoding="utf-8") as f:
-                        f.write(ignore_entry)
-                    print(
-                        f"{Colors.GREEN}Created '.dockerignore' file with '{ignore_entry}'.{Colors.RESET}"
-                    )
-            except IOError as e:
-                print(
-                    f"{Colors.RED}Error generating/updating .dockerignore at {dockerignore_path}: {e}{Colors.RESET}"
-                )
-                print(
-                    f"{Colors.YELLOW}Please ensure you have write permissions in the project directory.{Colors.RESET}"
-                )
+            ensure_dockerignore(project_abs_path)
 
             # Step 9: Docker Build and Run
             image_tag = dockerfile_output_name.replace(".Dockerfile", "").lower()
 
             build_choice = (
                 input(
-                    f"\n{Colors.CYAN}Do you want to build the Docker image '{image_tag}'? [Y/n]: {Colors.RESET}"
+                    f"\n{CYAN}Do you want to build the Docker image '{image_tag}'? [Y/n]: {RESET}"
                 )
                 .strip()
                 .lower()
             )
             if build_choice == "y" or build_choice == "":
-                # Pass the full path to the generated Dockerfile
-                if build_docker_image(project_abs_path, image_tag, dockerfile_path):
+                # Docker reads the Dockerfile from stdin; the written file is kept for reference
+                if build_docker_image(
+                    project_abs_path,
+                    image_tag,
+                    dockerfile_path,
+                    dockerfile_content=dockerfile_content,
+                ):
                     run_choice = (
                         input(
-                            f"{Colors.CYAN}Do you want to run the Docker container from '{image_tag}'? [Y/n]: {Colors.RESET}"
+                            f"{CYAN}Do you want to run the Docker container from '{image_tag}'? [Y/n]: {RESET}"
                         )
                         .strip()
                         .lower()
@@ -359,27 +349,28 @@ def main():
                     if run_choice == "y" or run_choice == "":
                         run_docker_container(image_tag)
                     else:
-                        print(
-                            f"{Colors.YELLOW}Skipping Docker container run.{Colors.RESET}"
-                        )
+                        print(f"{YELLOW}Skipping Docker container run.{RESET}")
                 else:
                     print(
-                        f"{Colors.RED}Docker image build failed. Skipping container run.{Colors.RESET}"
+                        f"{RED}Docker image build failed. Skipping container run.{RESET}"
                     )
             else:
-                print(
-                    f"{Colors.YELLOW}Skipping Docker image build and container run.{Colors.RESET}"
-                )
+                print(f"{YELLOW}Skipping Docker image build and container run.{RESET}")
 
             print("\n--- Project Information ---")
-            for key, value in project_info.items():
-                print(f"{key}: {value}")
+            sys.stdout.write(
+                "\n".join(
+                    f"{key}: {value}"
+                    for key, value in dataclasses.asdict(project_info).items()
+                )
+                + "\n"
+            )
             print("---------------------------\n")
-            print(f"{Colors.BLUE}Process completed.{Colors.RESET}")
+            print(f"{BLUE}Process completed.{RESET}")
             break
         else:
             print(
-                f"{Colors.RED}Failed to gather necessary project information. Please select another project or navigate.{Colors.RESET}"
+                f"{RED}Failed to gather necessary project information. Please select another project or navigate.{RESET}"
             )
             continue
 
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from cli_utils import write_atomic
+from yaml_processing import parse_yaml_for_build_info
+
+# Location of the parsed-workflow cache, shared with the bare clones of git_operations
+YAML_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "repro-build", "yaml")
+
+# Bump whenever parse_yaml_for_build_info or the entry format changes, so older entries are ignored
+_CACHE_VERSION = 1
+
+
+def _path_entry(yaml_file_path):
+    """
+    Returns the path of the per-file cache entry for yaml_file_path.
+    """
+    path_id = hashlib.sha1(yaml_file_path.encode("utf-8")).hexdigest()
+    return os.path.join(YAML_CACHE_DIR, f"{path_id}.json")
+
+
+def _content_entry(digest):
+    """
+    Returns the path of the cache entry for file contents with the given SHA-256 digest.
+    """
+    return os.path.join(YAML_CACHE_DIR, f"v{_CACHE_VERSION}-sha256-{digest}.json")
+
+
+def _read_cache(cache_path):
+    """
+    Returns the JSON object stored at cache_path, or None if it is missing or unreadable.
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def _write_cache(cache_path, entry):
+    """
+    Writes the cache entry with write_atomic, so a concurrent or interrupted run
+    never sees a partial file.
+    Failures are ignored; the cache is only an optimization.
+    """
+    try:
+        os.makedirs(YAML_CACHE_DIR, exist_ok=True)
+        write_atomic(cache_path, json.dumps(entry).encode("utf-8"))
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load_cached(yaml_file_path):
+    """
+    Returns the parsed build info of yaml_file_path, as parse_yaml_for_build_info does.
+    Results are kept as JSON under YAML_CACHE_DIR. While the file's path, modification
+    time and size are unchanged the entry is used after a single stat; otherwise the
+    file is hashed, and any earlier parse of the same contents is reused, so warm runs
+    and fresh worktrees of the same commit skip the YAML parse.
+    """
+    yaml_file_path = os.path.abspath(yaml_file_path)
+    try:
+        st = os.stat(yaml_file_path)
+    except OSError:
+        return parse_yaml_for_build_info(yaml_file_path)
+    key = [_CACHE_VERSION, yaml_file_path, st.st_mtime_ns, st.st_size]
+    path_entry = _path_entry(yaml_file_path)
+
+    cached = _read_cache(path_entry)
+    if cached is not None and cached.get("key") == key and "jobs" in cached:
+        return cached["jobs"]
+
+    try:
+        with open(yaml_file_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return parse_yaml_for_build_info(yaml_file_path)
+
+    cached = _read_cache(_content_entry(digest))
+    if cached is not None and "jobs" in cached:
+        jobs_info = cached["jobs"]
+    else:
+        jobs_info = parse_yaml_for_build_info(yaml_file_path)
+        # Empty results are not stored, so a file that failed to parse is reported again next run
+        if not jobs_info:
+            return jobs_info
+        _write_cache(_content_entry(digest), {"jobs": jobs_info})
+    _write_cache(path_entry, {"key": key, "sha256": digest, "jobs": jobs_info})
+    return jobs_info
@@ -1,7 +1,127 @@
 import os
 import re
-import yaml
-from cli_colors import Colors
+from cli_colors import RESET, RED, GREEN, YELLOW, BLUE, CYAN
+from cli_utils import select_from
+
+# Loader class used for workflow files; set by _safe_loader on first use
+_SafeLoader = None
+
+_YAML_MENU_HEADER = f"\n{BLUE}Multiple YAML files detected. Please select one to use for build instructions:{RESET}"
+
+_STR_TAG = "tag:yaml.org,2002:str"
+_MERGE_TAG = "tag:yaml.org,2002:merge"
+
+# (absolute path, st_mtime_ns, st_size) -> parsed jobs info; unchanged files are not parsed twice per session
+_PARSE_CACHE = {}
+
+# Leading major.minor(.patch) part of a setup-node version spec
+_NODE_VERSION_RE = re.compile(r"(\d+\.\d+(?:\.\d+|x)?)")
+
+
+def _extract_run_steps(steps):
+    """
+    Returns the 'run' commands of a job's steps, in order.
+    steps must contain only mappings.
+    """
+    run_steps = []
+    for step in steps:
+        run = step.get("run")
+        if run is not None:
+            run_steps.append(run)
+    return run_steps
+
+
+def _extract_node_version(steps):
+    """
+    Returns the Node.js version of the first actions/setup-node step with a node-version,
+    or None if the job has no such step. steps must contain only mappings.
+    """
+    for step in steps:
+        # A prefix match, so forks like "someone/actions/setup-node-x" are not picked up
+        uses = step.get("uses") or ""
+        if not (uses.startswith("actions/setup-node@") or uses == "actions/setup-node"):
+            continue
+        with_ = step.get("with")
+        node_version = with_.get("node-version") if isinstance(with_, dict) else None
+        if node_version is not None:
+            node_version_from_yaml = str(node_version).strip()
+            match = _NODE_VERSION_RE.match(node_version_from_yaml)
+            if not match:
+                return node_version_from_yaml
+            clean_version = match.group(1)
+            if clean_version.endswith(".x"):
+                return clean_version.replace(".x", "")
+            return clean_version
+    return None
+
+
+def _safe_loader():
+    """
+    Returns the safe YAML loader class, importing PyYAML on the first call so the
+    CLI starts without it. libyaml's C loader is much faster; the pure-Python one
+    is used, with a one-time warning, if PyYAML was built without it.
+    """
+    global _SafeLoader
+    if _SafeLoader is None:
+        try:
+            from yaml import CSafeLoader as loader
+        except ImportError:
+            from yaml import SafeLoader as loader
+
+            # Shown once per session, since the loader is only chosen once
+            print(
+                f"{YELLOW}Warning: PyYAML was built without libyaml; YAML files are parsed with the slower pure-Python loader. Reinstall PyYAML from a wheel ('pip install --force-reinstall PyYAML') to enable it.{RESET}"
+            )
+        _SafeLoader = loader
+    return _SafeLoader
+
+
+def _is_key(node, name):
+    """
+    Returns True if node is the plain string mapping key name.
+    """
+    return node.tag == _STR_TAG and node.value == name
+
+
+def _load_jobs(stream):
+    """
+    Returns the 'jobs' mapping of a workflow document, or None if it has none.
+    The document is only composed into nodes; Python objects are constructed for
+    each job's 'steps' alone, so triggers, env blocks and other job settings are skipped.
+    """
+    import yaml
+
+    loader = _safe_loader()(stream)
+    try:
+        root = loader.get_single_node()
+        if not isinstance(root, yaml.MappingNode):
+            return None
+        jobs_node = None
+        for key_node, value_node in root.value:
+            if _is_key(key_node, "jobs"):
+                jobs_node = value_node
+        if jobs_node is None:
+            return None
+        if not isinstance(jobs_node, yaml.MappingNode):
+            return loader.construct_document(jobs_node)
+
+        jobs = {}
+        for key_node, job_node in jobs_node.value:
+            job_name = loader.construct_document(key_node)
+            # Jobs using merge keys ('<<: *defaults') may inherit their steps, so build them whole
+            if not isinstance(job_node, yaml.MappingNode) or any(
+                field_node.tag == _MERGE_TAG for field_node, _ in job_node.value
+            ):
+                jobs[job_name] = loader.construct_document(job_node)
+                continue
+            job = {}
+            for field_node, value_node in job_node.value:
+                if _is_key(field_node, "steps"):
+                    job["steps"] = loader.construct_document(value_node)
+            jobs[job_name] = job
+        return jobs
+    finally:
+        loader.dispose()
 
 
 def parse_yaml_for_build_info(yaml_file_path):
@@ -9,47 +129,41 @@ def parse_yaml_for_build_info(yaml_file_path):
     Parses a given YAML file to extract potential build instructions and Node.js versions per job.
     Returns a dictionary of job_name -> {'steps': [], 'node_version': None}.
     """
+    try:
+        st = os.stat(yaml_file_path)
+        # The size also catches same-tick rewrites on filesystems with coarse timestamps
+        cache_key = (os.path.abspath(yaml_file_path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        cache_key = None
+    if cache_key in _PARSE_CACHE:
+        return _PARSE_CACHE[cache_key]
+
+    import yaml
+
     jobs_info = {}
 
     try:
-        with open(yaml_file_path, "r", encoding="utf-8") as f:
-            yaml_content = yaml.safe_load(f)
-
-        if isinstance(yaml_content, dict) and "jobs" in yaml_content:
-            for job_name, job_details in yaml_content["jobs"].items():
-                current_job_steps = []
-                current_job_node_version = None
-
-                if isinstance(job_details, dict) and "steps" in job_details:
-                    for step in job_details["steps"]:
-                        if isinstance(step, dict):
-                            if "run" in step:
-                                current_job_steps.append(step["run"])
-                            if "uses" in step and "actions/setup-node" in step["uses"]:
-                                if "with" in step and "node-version" in step["with"]:
-                                    if current_job_node_version is None:
-                                        node_version_from_yaml = str(
-                                            step["with"]["node-version"]
-                                        ).strip()
-                                        match = re.match(
-                                            r"(\d+\.\d+(\.\d+|x)?).*",
-                                            node_version_from_yaml,
-                                        )
-                                        if match:
-                                            clean_version = match.group(1)
-                                            if clean_version.endswith(".x"):
-                                                current_job_node_version = (
-                                                    clean_version.replace(".x", "")
-                                                )
-                                            else:
-                                                current_job_node_version = clean_version
-                                        else:
-                                            current_job_node_version = (
-                                                node_version_from_yaml
-                                            )
-                                        print(
-                                            f"{Colors.CYAN}Info: Detected Node.js version '{current_job_node_version}' for job '{job_name}' in '{os.path.basename(yaml_file_path)}'.{Colors.RESET}"
-                                        )
+        # Read as bytes; the loader detects and decodes the encoding itself
+        with open(yaml_file_path, "rb") as f:
+            jobs = _load_jobs(f)
+
+        if jobs is not None:
+            for job_name, job_details in jobs.items():
+                steps = (
+                    job_details.get("steps") if isinstance(job_details, dict) else None
+                )
+                # Jobs without a steps list ('steps:' left empty, reusable-workflow calls) have nothing to extract
+                if not isinstance(steps, list):
+                    continue
+
+                # Non-mapping entries are dropped once here, so the helpers can call .get directly
+                steps = [step for step in steps if isinstance(step, dict)]
+                current_job_steps = _extract_run_steps(steps)
+                current_job_node_version = _extract_node_version(steps)
+                if current_job_node_version is not None:
+                    print(
+                        f"{CYAN}Info: Detected Node.js version '{current_job_node_version}' for job '{job_name}' in '{os.path.basename(yaml_file_path)}'.{RESET}"
+                    )
 
                 if current_job_steps or current_job_node_version:
                     jobs_info[job_name] = {
@@ -58,13 +172,15 @@ def parse_yaml_for_build_info(yaml_file_path):
                     }
 
     except yaml.YAMLError as e:
-        print(
-            f"{Colors.RED}Error parsing YAML file '{yaml_file_path}': {e}{Colors.RESET}"
-        )
+        print(f"{RED}Error parsing YAML file '{yaml_file_path}': {e}{RESET}")
     except Exception as e:
         print(
-            f"{Colors.RED}An unexpected error occurred while parsing '{yaml_file_path}': {e}{Colors.RESET}"
+            f"{RED}An unexpected error occurred while parsing '{yaml_file_path}': {e}{RESET}"
         )
+    else:
+        # Only clean parses are cached, so errors are reported again on a retry
+        if cache_key is not None:
+            _PARSE_CACHE[cache_key] = jobs_info
 
     return jobs_info
 
@@ -74,38 +190,16 @@ def get_yaml_file_selection(yaml_files):
     Presents a list of detected YAML files and prompts the user to select one.
     Returns the path to the selected YAML file, or None if the user quits.
     """
-    while True:
-        print(
-            f"\n{Colors.BLUE}Multiple YAML files detected. Please select one to use for build instructions:{Colors.RESET}"
-        )
-        for i, yf_path in enumerate(yaml_files):
-            print(f"  {Colors.YELLOW}[{i+1}]{Colors.RESET} {os.path.relpath(yf_path)}")
-        print(f"  {Colors.YELLOW}[q]{Colors.RESET} Quit")
+    # Paths relative to the working directory
+    prefix = os.path.join(os.getcwd(), "")
+    prefix_len = len(prefix)
 
-        choice = input(
-            f"{Colors.CYAN}Enter a number or 'q' to quit: {Colors.RESET}"
-        ).strip()
+    def display_name(yf_path):
+        if yf_path.startswith(prefix):
+            return yf_path[prefix_len:]
+        return os.path.relpath(yf_path)
 
-        if choice.lower() == "q":
-            return None
-        elif choice.isdigit():
-            try:
-                index = int(choice) - 1
-                if 0 <= index < len(yaml_files):
-                    selected_file = yaml_files[index]
-                    print(
-                        f"{Colors.GREEN}Selected YAML file:{Colors.RESET} {os.path.basename(selected_file)}"
-                    )
-                    return selected_file
-                else:
-                    print(
-                        f"{Colors.RED}Invalid number. Please choose a number from the list.{Colors.RESET}"
-                    )
-            except ValueError:
-                print(
-                    f"{Colors.RED}Invalid input. Please enter a number or 'q'.{Colors.RESET}"
-                )
-        else:
-            print(
-                f"{Colors.RED}Invalid input. Please enter a number or 'q'.{Colors.RESET}"
-            )
+    selected_file = select_from(yaml_files, _YAML_MENU_HEADER, display_name)
+    if selected_file is not None:
+        print(f"{GREEN}Selected YAML file:{RESET} {os.path.basename(selected_file)}")
+    return selected_file